@@ -1,19 +1,17 @@
 import streamlit as st
 from plotmanager import PlotManager
+import trends
+import extremes
 
 # Inicializace promennych, do kterych se ukladaji nepovinne vybery uzivatele
 roll_avg_window = None
 lintrend = False
 
 
-@st.cache_data
-def data_accessibility():
-    '''Metadata pro handling nabidky v jednotlivych widgets'''
-    return PlotManager.data_accessibility
-
-
-# Veškerá data a udaje o jejich dostupnosti v proměnných (využití cache pro zrychlení aplikace)
-data_accessibility = data_accessibility()
+# Udaje o dostupnosti dat - metadata pro handling nabidky v jednotlivych widgets
+# Pouziva se primo sdilena DataFrame z PlotManager (memory-mapped, bez kopie) - st.cache_data by ji
+# pri kazdem volani serializoval a vracel novou kopii
+data_accessibility = PlotManager.data_accessibility
 
 
 def average_selection(station, filter, quantity):
@@ -24,6 +22,22 @@ def average_selection(station, filter, quantity):
     accessible_selection.extend(normals)
     return accessible_selection
 
+
+def heatmap_selection(station, quantity):
+    '''Sestavuje nabidku hodnot pro mapu rok x mesic - namerene hodnoty nebo odchylky od dostupnych normalu'''
+    accessible_selection = ['Naměřené hodnoty']
+    cols = [col for col in data_accessibility.columns if col.startswith('Normál')]
+    normals = (data_accessibility
+               .xs((station, quantity), level=['Stanice', 'Veličina'])
+               .loc[:, cols]
+               .dropna(how='all', axis=1)
+               .columns)
+    accessible_selection.extend(normals)
+    return accessible_selection
+
+# Typy zobrazení - sloupcový graf pro jeden filtr, nebo mapa rok x měsíc pro celý záznam stanice
+view_types = ['Sloupcový graf', 'Mapa rok × měsíc']
+
 # Nadpis a deklarace zdroje dat
 title = 'PROHLÍŽEČ HISTORICKÝCH KLIMATOLOGICKÝCH DAT'
 reference = 'https://www.chmi.cz/files/portal/docs/meteo/ok/open_data/Podminky_uziti_udaju.pdf'
@@ -34,6 +48,8 @@ st.write("**Podmínky při využití dat: [Pravidla ČHMÚ](%s)**" % reference)
 # Oddělovací čára
 st.markdown('---')
 
+view = st.radio('Typ zobrazení', view_types, horizontal=True)
+
 # Hlavní widgety - stanice, veličina, filtr (vybraný měsíc nebo data za celý rok)
 col1, col2, col3 = st.columns(3)
 
@@ -44,6 +60,32 @@ with col1:
 with col2:
     quantity = st.selectbox('Měřená veličina', PlotManager.quantities.keys())
 
+# Mapa rok x měsíc - filtr nemá smysl, místo něj volba zobrazených hodnot (naměřené nebo odchylky od normálu)
+# Graf se vykreslí a zbytek skriptu se již neprovádí
+if view == 'Mapa rok × měsíc':
+    with col3:
+        heatmap_values = st.selectbox('Zobrazené hodnoty', heatmap_selection(station, quantity))
+
+    availability = data_accessibility.xs((station, quantity), level=['Stanice', 'Veličina'])
+    year_min = int(availability['min_year'].min())
+    year_max = int(availability['max_year'].max())
+    start_yr, end_yr = st.slider('Obdobi', year_min, year_max, (year_min, year_max))
+
+    st.markdown('---')
+
+    if station in PlotManager.station_remarks.keys():
+        st.write('Poznámka: ', PlotManager.station_remarks[station])
+
+    heatmap_ref = None if heatmap_values == 'Naměřené hodnoty' else heatmap_values
+    heatmap = PlotManager.heatmap_req(station, quantity, start_yr, end_yr, heatmap_ref)
+
+    if isinstance(heatmap, str):
+        st.write(heatmap)
+    else:
+        st.pyplot(heatmap)
+
+    st.stop()
+
 with col3:
     filter = st.selectbox('Filtr', PlotManager.filters)
 
@@ -133,4 +175,55 @@ else:
             st.write('Regresní parametry')
             st.table(PM.table_req('reg'))
 
+    # Rekordy a pořadí - z předpočítaného indexu pořadí a rekordů pro vybranou časovou řadu
+    st.markdown('---')
+    st.write('**Rekordy a pořadí**')
+
+    col9, col10 = st.columns(2)
+
+    with col9:
+        record_years = sorted(PM.required_data.index)
+        record_year = st.selectbox('Rok', record_years, index=len(record_years) - 1)
+        value = PM.required_data.loc[record_year].iloc[0]
+
+        since_high = PlotManager.highest_since(station, filter, quantity, record_year)
+        since_low = PlotManager.highest_since(station, filter, quantity, record_year, highest=False)
+        high_str = f'nejvyšší od roku {since_high}' if since_high else 'nejvyšší od začátku měření'
+        low_str = f'nejnižší od roku {since_low}' if since_low else 'nejnižší od začátku měření'
+        st.write(f'Hodnota {value:.1f}: {high_str}, {low_str}')
+        st.table(PlotManager.year_ranks(station, filter, quantity, record_year))
+
+    with col10:
+        st.write('Postupné rekordy')
+        st.table(PlotManager.records_table(station, filter, quantity)
+                 .style.format({'Hodnota': '{:.1f}', 'Předchozí rekord': '{:.1f}'}))
 
+
+
+# Oddělovací čára
+st.markdown('---')
+
+# Pořadí stanic podle trendu - z předpočítané tabulky trendů pro zvolenou veličinu a filtr
+st.write(f'**Pořadí stanic podle trendu (veličina: {quantity}, filtr: {filter})**')
+trend_period = st.selectbox('Období pro výpočet trendu', trends.periods.keys())
+ranking = PlotManager.trend_ranking(filter, quantity, trend_period)
+
+if ranking.empty:
+    st.write('Pro zvolené období nejsou data k výpočtu trendu k dispozici')
+else:
+    st.table(ranking.style.format({'Senův sklon': '{:.3f}',
+                                   'p-hodnota (Mann-Kendall)': '{:.3f}',
+                                   'OLS sklon': '{:.3f}',
+                                   'Počet let': '{:.0f}'}))
+
+# Doby opakování extrémních denních srážek - pouze při zobrazení denních maxim srážek
+if quantity == 'Srážky - denní maximum':
+    st.markdown('---')
+    st.write(f'**Návrhové denní úhrny srážek (mm) pro stanici {station}, '
+             f'{extremes.confidence:.0%} interval spolehlivosti (bootstrap)**')
+    levels = PlotManager.return_levels(station)
+
+    if levels.empty:
+        st.write('Pro výpočet návrhových hodnot není k dispozici dostatek ročních maxim')
+    else:
+        st.table(levels.style.format('{:.1f}'))
@@ -2,6 +2,8 @@ import pandas as pd
 import csv
 import os
 import numpy as np
+import sys
+import time
 
 def get_float(general_number: str):
     '''Kills the numbers which are represented as a string containing number with decimal ,.
@@ -59,6 +61,38 @@ def file_to_df(filepath: str, filter: str):
     return final_df
 
 
+def file_to_frame(filepath: str, statistics: list):
+    '''Transforms all parts of the original file, which have "Statistika" in statistics, into single DataFrame
+    (one column per statistic). The file is read only once and decimal commas are parsed directly by read_csv'''
+    # Získání názvu souboru bez přípony, ze kterého se tahají data
+    filename_raw = os.path.basename(filepath).partition('.')[0]
+
+    # Stažení se správným encodingem, delimiterem a desetinnou čárkou - odpadá převod přes get_float
+    rough_df = pd.read_csv(filepath, delimiter=';', encoding='windows-1250', decimal=',')
+
+    # Sloupce s hodnotami (nikoli datumy jejich dosažení) a názvy měsíců (Hodnota leden -> leden atd.)
+    columns_lst = [column for column in rough_df.columns if 'Hodnota' in column]
+    months = [column.partition(' ')[2] for column in columns_lst]
+
+    # Jediný reshape pro všechny statistiky najednou: pole roky x měsíce x statistiky,
+    # kam se každý řádek souboru zapíše na pozici svého roku a své statistiky
+    # Přeskládání na (roky * měsíce) x statistiky pak odpovídá struktuře po stack() ve file_to_df
+    rough_df = rough_df[rough_df['Statistika'].isin(statistics)]
+    years = np.unique(rough_df['Rok'])
+    values = np.full((len(years), len(months), len(statistics)), np.nan)
+    year_pos = np.searchsorted(years, rough_df['Rok'])
+    stat_pos = pd.Index(statistics).get_indexer(rough_df['Statistika'])
+    values[year_pos, :, stat_pos] = rough_df[columns_lst].to_numpy(dtype=float)
+
+    index = pd.MultiIndex.from_product([years, months], names=['Rok', 'Měsíc'])
+    columns = [f'{filename_raw}_{statistic.lower()}' for statistic in statistics]
+
+    # Řádky, kde chybí všechny statistiky, se zahodí (stejně jako u stack() ve file_to_df)
+    final_df = pd.DataFrame(values.reshape(-1, len(statistics)), index=index, columns=columns).dropna(how='all')
+
+    return final_df
+
+
 def daily_data_to_df(filepath: str):
     '''Returns the special file with daily data to DataFrame, which is able to be joined to the monthly data'''
     months = \
@@ -203,8 +237,32 @@ class FileProcessor:
         #     os.remove(os.path.join(self.folderpath, 'temporary.csv'))
 
 
-    def join_files(self):
-        '''Joins all files into one file, where also data are transformed into more user-friendly configuration'''
+    def _daily_frame(self):
+        '''Returns DataFrame with characteristic days from the file with daily data (Daily_data.csv)'''
+        return daily_data_to_df(os.path.join(self.folderpath, 'Daily_data.csv'))
+
+
+    def _joined_frame(self, daily_df):
+        '''Returns DataFrame with all data of the location - each file is read only once (file_to_frame)
+        and all partial DataFrames are combined by single concat, aligned to the rows of the first one'''
+
+        # List pro join - je potřeba vyhodit ze self.files soubor, který obsahuje denní data a finální soubor
+        join_list = [file for file in self.files if file not in ('Daily_data.csv', f'{self.location}.csv')]
+
+        # Jedna DataFrame za každý soubor s měsíčními daty, obsahuje všechny jeho statistiky
+        df_list = [file_to_frame(os.path.join(self.folderpath, file), FileProcessor.file_stats[file])
+                   for file in join_list]
+
+        # Přidání DataFrame ze souboru s denními daty (Daily_data.csv)
+        df_list.append(daily_df)
+
+        # Jeden concat místo řetězu joinů, reindex zachová řádky (a jejich pořadí) první DataFrame jako dříve join
+        return pd.concat(df_list, axis=1).reindex(df_list[0].index)
+
+
+    def _joined_frame_legacy(self, daily_df):
+        '''Original way of joining - every statistic read separately (file_to_df) and a chain of pairwise joins
+        Kept only for the comparison of results and timing (compare_parsing_times)'''
 
         # Zárodek pro list, obsahující všechny dílčí DataFrames, které se ze souborů dají vytáhnout
         df_list = []
@@ -225,8 +283,7 @@ class FileProcessor:
                 df_list.append(file_to_df(pth, statistic))
 
         # Přidání DataFrame ze souboru s denními daty (Daily_data.csv)
-        pth = os.path.join(self.folderpath, 'Daily_data.csv')
-        df_list.append(daily_data_to_df(pth))
+        df_list.append(daily_df)
 
 
         # Join všech DataFrames z proměnné df_list do final_frame
@@ -234,6 +291,14 @@ class FileProcessor:
         for frame in df_list[1:]:
             final_frame = final_frame.join(frame)
 
+        return final_frame
+
+
+    def join_files(self):
+        '''Joins all files into one file, where also data are transformed into more user-friendly configuration'''
+
+        final_frame = self._joined_frame(self._daily_frame())
+
         # Přidání sloupce, který notifikuje lokaci (pro pozdější appendování souborů s daty z jiných stanic)
         final_frame.insert(loc=0, column='Stanice', value=final_frame.shape[0]*[self.location])
 
@@ -261,6 +326,30 @@ class FileProcessor:
                 final_df.to_csv('Data.csv', index=False)
 
 
+    def time_joining(self, repeat=3):
+        '''Measures the time (best of repeat runs) of the original and current way of joining the files
+        Daily data are processed the same way in both cases, so they are read only once and excluded from timing
+        Returns tuple (legacy time, current time, results are equal) - nothing is written to the disk'''
+
+        daily_df = self._daily_frame()
+
+        def best_time(method):
+            times = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                frame = method(daily_df)
+                times.append(time.perf_counter() - start)
+            return min(times), frame
+
+        legacy_time, legacy_frame = best_time(self._joined_frame_legacy)
+        current_time, current_frame = best_time(self._joined_frame)
+
+        # Porovnání výsledků - pořadí sloupců se může lišit, hodnoty a řádky musí sedět
+        equal = legacy_frame.equals(current_frame[legacy_frame.columns])
+
+        return legacy_time, current_time, equal
+
+
     # def process_all_locations(self):
     #     '''Performs the complete processing of all data in the folder Locations, using sequence of above defined methods'''
     #     for location in os.listdir('Locations'):
@@ -273,7 +362,22 @@ class FileProcessor:
 
 
 
+def compare_parsing_times():
+    '''Prints the per-station comparison of the original and current way of joining the files'''
+    print(f"{'Stanice':<25}{'původní (s)':>12}{'nový (s)':>12}{'zrychlení':>12}{'shoda':>8}")
+
+    for location in sorted(os.listdir('Locations')):
+        fp = FileProcessor(f'Locations/{location}')
+        legacy_time, current_time, equal = fp.time_joining()
+        print(f'{location:<25}{legacy_time:>12.3f}{current_time:>12.3f}{legacy_time / current_time:>11.1f}x{str(equal):>8}')
+
+
 if __name__ == '__main__':
+    # Spuštění s argumentem "timing" pouze porovná rychlost původního a nového zpracování souborů
+    if len(sys.argv) > 1 and sys.argv[1] == 'timing':
+        compare_parsing_times()
+        sys.exit()
+
     # Následující sekvence zpracuje komplet všechny podsložky ve složce locations, sakum prásk
     # Ve výchozím stavu jsou tyto podsložky naplněny pouze surovými .csv soubory s původními názvy
     # Musí být jen správná sestava souborů, a pro správnou lokalitu. Vše další je zajištěno
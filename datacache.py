@@ -0,0 +1,74 @@
+import os
+import shutil
+import hashlib
+import pandas as pd
+
+
+# Slozka, do ktere se ukladaji predpocitane tabulky (relativne ke spoustenemu skriptu, stejne jako Data.csv)
+cache_dir = 'cache'
+
+# Pri zmene obsahu ukladanych tabulek, kodu, ktery je pocita, nebo usporadani series_matrix se zvysi format_version,
+# aby se tabulky ulozene starsim kodem nepouzily
+format_version = 2
+
+
+def dataset_version(filepath):
+    '''Vraci kratky otisk (hash) souboru s daty
+    Po kazde aktualizaci dat se otisk zmeni, a tim se zneplatni vsechny predpocitane tabulky'''
+
+    with open(filepath, 'rb') as fl:
+        return hashlib.md5(fl.read()).hexdigest()[:12]
+
+
+def frame_path(name, version):
+    '''Cesta k ulozene DataFrame s danym jmenem pro danou verzi dat'''
+    return os.path.join(cache_dir, f'{name}_v{format_version}_{version}.pkl')
+
+
+def remove_stale(current_paths):
+    '''Smaze z cache vse krome current_paths - tabulky a uloziste starsich verzi dat nebo starsich formatu
+    Rozepsane docasne soubory a slozky (.tmp) se nemazou, uklidi je proces, ktery je zapisuje
+    Chyby pri mazani se ignoruji (napr. soubor, ktery ma jiny proces otevreny na systemu Windows)'''
+
+    if not os.path.isdir(cache_dir):
+        return
+
+    keep = {os.path.basename(pth) for pth in current_paths}
+
+    for entry in os.listdir(cache_dir):
+        if entry in keep or '.tmp' in entry:
+            continue
+        pth = os.path.join(cache_dir, entry)
+        try:
+            if os.path.isdir(pth):
+                shutil.rmtree(pth)
+            else:
+                os.remove(pth)
+        except OSError:
+            pass
+
+
+def cached_frame(name, version, builder):
+    '''Vraci DataFrame ulozenou na disku pod jmenem name pro danou verzi dat
+    Pokud pro danou verzi jeste neexistuje, vytvori ji volanim funkce builder() a ulozi ji
+    Zapisuje se do docasneho souboru, ktery se nakonec atomicky prejmenuje - soubezne spustene
+    procesy tak nikdy nenactou rozepsany soubor'''
+
+    pth = frame_path(name, version)
+
+    if os.path.exists(pth):
+        return pd.read_pickle(pth)
+
+    frame = builder()
+
+    # Zapis do cache neni nutny pro beh aplikace - pri chybe (napr. read-only disk) se jen nic neulozi
+    tmp_pth = f'{pth}.tmp{os.getpid()}'
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        frame.to_pickle(tmp_pth)
+        os.replace(tmp_pth, pth)
+    except OSError:
+        if os.path.exists(tmp_pth):
+            os.remove(tmp_pth)
+
+    return frame
@@ -0,0 +1,105 @@
+import os
+import json
+import shutil
+import numpy as np
+import pandas as pd
+from datacache import cache_dir
+
+
+# Sdilene uloziste pripravenych ciselnych dat (jedna slozka pro kazdou verzi dat):
+# years.npy - roky (index casovych rad)
+# values.npy - matice casovych rad (roky x rady)
+# accessibility.npy - dostupnost dat a klimaticke normaly (rady x sloupce)
+# records_<i>.npy - matice indexu poradi a rekordu (roky x rady, resp. rady pro pocty let)
+# keys.json - textove klice k radkum a sloupcum matic
+# Matice se otviraji jako memory-mapped soubory pouze pro cteni, takze je vsechny procesy
+# serveru sdileji pres page cache operacniho systemu a zadny proces si nedela vlastni kopii
+
+# Pri zmene obsahu nebo usporadani uloziste se zvysi format_version, aby se stara uloziste nepouzila
+format_version = 3
+
+
+def store_path(version):
+    '''Cesta ke slozce uloziste pro danou verzi dat'''
+    return os.path.join(cache_dir, f'store_v{format_version}_{version}')
+
+
+def write_store(version, series_matrix, accessibility, records_index):
+    '''Zapise matici casovych rad, tabulku dostupnosti dat a index poradi a rekordu do uloziste
+    Klice indexu rekordu (text nebo dvojice textu) se ukladaji do keys.json, matice jako records_<poradi>.npy
+    Zapisuje se do docasne slozky, ktera se nakonec atomicky prejmenuje - soubezne spustene
+    procesy tak nikdy neuvidi rozepsane uloziste. Pokud jiny proces zapsal uloziste driv, docasna slozka se smaze'''
+
+    tmp_pth = f'{store_path(version)}.tmp{os.getpid()}'
+    os.makedirs(tmp_pth, exist_ok=True)
+
+    keys = \
+        {'series_names': list(series_matrix.columns.names),
+         'series_keys': [list(key) for key in series_matrix.columns],
+         'accessibility_names': list(accessibility.index.names),
+         'accessibility_keys': [list(key) for key in accessibility.index],
+         'accessibility_columns': list(accessibility.columns),
+         'records_keys': [list(key) if isinstance(key, tuple) else key for key in records_index.keys()]}
+
+    np.save(os.path.join(tmp_pth, 'years.npy'), series_matrix.index.to_numpy(dtype=np.int64))
+    np.save(os.path.join(tmp_pth, 'values.npy'), series_matrix.to_numpy(dtype=np.float64))
+    np.save(os.path.join(tmp_pth, 'accessibility.npy'), accessibility.to_numpy(dtype=np.float64))
+    for i, arr in enumerate(records_index.values()):
+        np.save(os.path.join(tmp_pth, f'records_{i}.npy'), arr)
+    with open(os.path.join(tmp_pth, 'keys.json'), 'w', encoding='utf-8') as fl:
+        json.dump(keys, fl, ensure_ascii=False)
+
+    try:
+        os.rename(tmp_pth, store_path(version))
+    except OSError:
+        shutil.rmtree(tmp_pth, ignore_errors=True)
+
+
+def open_store(version):
+    '''Pripoji uloziste dane verze pouze pro cteni (bez kopirovani dat)
+    Vraci trojici (matice casovych rad, dostupnost dat, index poradi a rekordu) - DataFrames jsou postaveny
+    primo nad memory-mapped poli, index rekordu je slovnik memory-mapped poli'''
+
+    pth = store_path(version)
+
+    with open(os.path.join(pth, 'keys.json'), encoding='utf-8') as fl:
+        keys = json.load(fl)
+
+    years = np.load(os.path.join(pth, 'years.npy'))
+    values = np.load(os.path.join(pth, 'values.npy'), mmap_mode='r')
+    accessibility = np.load(os.path.join(pth, 'accessibility.npy'), mmap_mode='r')
+
+    # Textove klice se drzi v kazdem procesu zvlast (jsou male), ciselna data zustavaji sdilena
+    series_columns = pd.MultiIndex.from_tuples([tuple(key) for key in keys['series_keys']],
+                                               names=keys['series_names'])
+    accessibility_index = pd.MultiIndex.from_tuples([tuple(key) for key in keys['accessibility_keys']],
+                                                    names=keys['accessibility_names'])
+
+    series_matrix = pd.DataFrame(values, index=pd.Index(years, name='Rok'), columns=series_columns, copy=False)
+    data_accessibility = pd.DataFrame(accessibility, index=accessibility_index,
+                                      columns=keys['accessibility_columns'], copy=False)
+
+    records_index = {tuple(key) if isinstance(key, list) else key:
+                     np.load(os.path.join(pth, f'records_{i}.npy'), mmap_mode='r')
+                     for i, key in enumerate(keys['records_keys'])}
+
+    return series_matrix, data_accessibility, records_index
+
+
+def load_store(version, builder):
+    '''Pripoji uloziste dane verze, pripadne jej nejdrive vytvori z vystupu funkce builder()
+    builder() vraci trojici (matice casovych rad, dostupnost dat, index rekordu) a vola se pouze v prvnim procesu
+    Pokud uloziste nelze zapsat (napr. read-only disk), vraci se primo vystup builder()'''
+
+    if not os.path.exists(store_path(version)):
+        series_matrix, accessibility, records_index = builder()
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            write_store(version, series_matrix, accessibility, records_index)
+        except OSError:
+            pass
+
+        if not os.path.exists(store_path(version)):
+            return series_matrix, accessibility, records_index
+
+    return open_store(version)
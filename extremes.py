@@ -0,0 +1,119 @@
+import math
+import zlib
+import numpy as np
+import pandas as pd
+
+
+# Doby opakovani (roky), pro ktere se pocitaji navrhove hodnoty
+return_periods = [10, 50, 100]
+
+# Pocet bootstrapovych vyberu a hladina intervalu spolehlivosti
+n_boot = 1000
+confidence = 0.95
+
+# Minimalni pocet rocnich maxim pro fit rozdeleni
+min_years = 20
+
+columns = ['Hodnota', 'Dolní mez', 'Horní mez']
+
+_gamma = np.vectorize(math.gamma, otypes=[float])
+
+
+def l_moments(samples):
+    '''Vyberove L-momenty l1, l2 a L-sikmost t3 podel posledni osy pole samples
+    Pocita se pres pravdepodobnostne vazene momenty b0, b1, b2 ze serazeneho vyberu'''
+
+    x = np.sort(samples, axis=-1)
+    n = x.shape[-1]
+    i = np.arange(n)
+
+    b0 = x.mean(axis=-1)
+    b1 = (x * i / (n - 1)).mean(axis=-1)
+    b2 = (x * i * (i - 1) / ((n - 1) * (n - 2))).mean(axis=-1)
+
+    l1 = b0
+    l2 = 2 * b1 - b0
+    l3 = 6 * b2 - 6 * b1 + b0
+
+    return l1, l2, l3 / l2
+
+
+def gumbel_quantiles(l1, l2, probs):
+    '''Navrhove hodnoty Gumbelova rozdeleni (fit metodou L-momentu) pro pravdepodobnosti nepredstizeni probs
+    Vstupy l1, l2 mohou byt pole (napr. pres bootstrapove vybery), vystup ma navic posledni osu podle probs'''
+
+    alpha = l2 / math.log(2)
+    xi = l1 - np.euler_gamma * alpha
+    y = -np.log(-np.log(np.asarray(probs)))
+
+    return xi[..., np.newaxis] + alpha[..., np.newaxis] * y
+
+
+def gev_quantiles(l1, l2, t3, probs):
+    '''Navrhove hodnoty zobecneneho rozdeleni extremnich hodnot (GEV), fit metodou L-momentu
+    Parametr tvaru k podle aproximace Hoskinga (1985), pro k blizke 0 prechazi v Gumbelovo rozdeleni'''
+
+    c = 2 / (3 + t3) - math.log(2) / math.log(3)
+    k = 7.8590 * c + 2.9554 * c ** 2
+
+    # Pro k blizke nule je vzorec numericky nestabilni, nahradi se limitou (Gumbel)
+    gumbel = np.abs(k) < 1e-6
+    k = np.where(gumbel, 1e-6, k)
+
+    g = _gamma(1 + k)
+    alpha = l2 * k / (g * (1 - 2 ** (-k)))
+    xi = l1 - alpha * (1 - g) / k
+
+    y = -np.log(np.asarray(probs))
+    k = k[..., np.newaxis]
+    quantiles = xi[..., np.newaxis] + alpha[..., np.newaxis] / k * (1 - y ** k)
+
+    return np.where(gumbel[..., np.newaxis], gumbel_quantiles(l1, l2, probs), quantiles)
+
+
+def fit_return_levels(maxima, rng):
+    '''Navrhove hodnoty a bootstrapove intervaly spolehlivosti pro jednu radu rocnich maxim
+    Vsechny bootstrapove vybery se fituji najednou (matice n_boot x pocet let)
+    Vraci DataFrame s indexem (Rozdělení, Doba opakování) a sloupci podle promenne columns'''
+
+    probs = 1 - 1 / np.asarray(return_periods, dtype=float)
+    boot = rng.choice(maxima, size=(n_boot, len(maxima)), replace=True)
+    lower, upper = (1 - confidence) / 2, (1 + confidence) / 2
+
+    fits = \
+        {'Gumbel': lambda s: gumbel_quantiles(*l_moments(s)[:2], probs),
+         'GEV': lambda s: gev_quantiles(*l_moments(s), probs)}
+
+    rows = []
+    for dist, fit in fits.items():
+        estimate = fit(maxima)
+        boot_levels = fit(boot)
+        bounds = np.nanquantile(boot_levels, [lower, upper], axis=0)
+        for idx, period in enumerate(return_periods):
+            rows.append((dist, period, estimate[idx], bounds[0, idx], bounds[1, idx]))
+
+    return (pd.DataFrame(rows, columns=['Rozdělení', 'Doba opakování'] + columns)
+            .set_index(['Rozdělení', 'Doba opakování'])
+            )
+
+
+def compute_extremes_table(annual_maxima, seed=0):
+    '''Navrhove hodnoty pro vsechny stanice
+    annual_maxima - DataFrame s roky v indexu a stanicemi ve sloupcich (chybejici roky NaN)
+    Stanice s mene nez min_years roky dat se vynechaji, bez vhodne stanice se vraci prazdna DataFrame
+    Kazda stanice ma vlastni generator nahodnych cisel odvozeny od seed a nazvu stanice, takze jeji intervaly
+    spolehlivosti zavisi pouze na jejich datech, nikoli na ostatnich stanicich'''
+
+    frames = dict()
+
+    for station in annual_maxima.columns:
+        maxima = annual_maxima[station].dropna().to_numpy(dtype=float)
+        if len(maxima) >= min_years:
+            rng = np.random.default_rng([seed, zlib.crc32(station.encode())])
+            frames[station] = fit_return_levels(maxima, rng)
+
+    if not frames:
+        index = pd.MultiIndex.from_tuples([], names=['Stanice', 'Rozdělení', 'Doba opakování'])
+        return pd.DataFrame(columns=columns, index=index, dtype=float)
+
+    return pd.concat(frames, names=['Stanice']).sort_index()
@@ -1,6 +1,11 @@
 import pandas as pd
 import numpy as np
 from matplotlib import pyplot as plt
+import trends
+import extremes
+import records
+import datastore
+from datacache import dataset_version, cached_frame, frame_path, remove_stale
 
 
 class PlotManager:
@@ -8,6 +13,7 @@ class PlotManager:
 
     quantities = \
         {'Srážky': {'color': 'blue', 'ylabel': 'Suma srážek (mm)'},
+         'Srážky - denní maximum': {'color': 'darkblue', 'ylabel': 'Maximální denní úhrn srážek (mm)'},
          'Teplota - průměr': {'color': 'green', 'ylabel': 'Průměrná teplota (°C)'},
          'Teplota - minimum': {'color': 'purple', 'ylabel': 'Minimální teplota (°C)'},
          'Teplota - maximum': {'color': 'red', 'ylabel': 'Maximální teplota (°C)'},
@@ -43,11 +49,18 @@ class PlotManager:
          'Vizovice': 'Sluneční svit k dispozici až od roku 2007'}
 
 
-    source_data = pd.read_csv('Data.csv')
+    source_path = 'Data.csv'
 
 
     @classmethod
-    def _prepare_data_accessibility_tbl(cls):
+    def _load_source_data(cls):
+        '''Nacteni zdrojovych dat ze souboru .csv
+        Vola se pouze pri tvorbe sdileneho uloziste dat, dalsi procesy se k ulozisti jen pripoji'''
+        return pd.read_csv(cls.source_path).rename(columns={'Precipitations_max': 'Srážky - denní maximum'})
+
+
+    @staticmethod
+    def _compute_data_accessibility(source_data):
 
         def climatic_normal(df, eval_col, start_year, end_year):
             '''Vypocet klimatickeho normalu za obdobi, ohranicene start_year a end_year
@@ -81,8 +94,6 @@ class PlotManager:
                 'Normál 1991 - 2020': climatic_normal(df, eval_col, 1991, 2020)
                 })
 
-        source_data = cls.source_data
-
         # Vsechny sloupce, ktere nechceme pivotovat
         id_vars = ['Stanice', 'Měsíc', 'Rok']
 
@@ -91,10 +102,272 @@ class PlotManager:
         melted = melted.dropna(subset=['value'])
 
         # Agregace melted tabulky s vypoctem, ktery ridi pd.Serie applied_functions
-        cls.data_accessibility = (melted
-                                  .groupby(['Stanice', 'Měsíc', 'Veličina'])
-                                  .apply(lambda x: applied_functions(x, 'value'), include_groups=False)
-                                  )
+        return (melted
+                .groupby(['Stanice', 'Měsíc', 'Veličina'])
+                .apply(lambda x: applied_functions(x, 'value'), include_groups=False)
+                )
+
+
+    @classmethod
+    def _compute_series_matrix(cls, source_data):
+        '''Vsechny casove rady v jedne matici - roky v indexu, sloupce (Stanice, Měsíc, Veličina)
+        Slouzi jako zdroj pro davkove (vektorove) vypocty pres vsechny stanice najednou
+        Roky tvori souvislou radu a sloupce uplny soucin stanice x veliciny x filtry (v poradi cls.filters),
+        takze matici lze bez kopirovani preskladat na krychli (viz _prepare_series_cube)'''
+
+        matrix = (source_data
+                  .set_index(['Rok', 'Stanice', 'Měsíc'])
+                  .unstack(['Stanice', 'Měsíc'])
+                  .rename_axis(columns=['Veličina', 'Stanice', 'Měsíc'])
+                  .reorder_levels(['Stanice', 'Měsíc', 'Veličina'], axis=1)
+                  )
+
+        stations = sorted(matrix.columns.unique(level='Stanice'))
+        quantities = sorted(matrix.columns.unique(level='Veličina'))
+        columns = (pd.MultiIndex
+                   .from_product([stations, quantities, cls.filters], names=['Stanice', 'Veličina', 'Měsíc'])
+                   .reorder_levels(['Stanice', 'Měsíc', 'Veličina'])
+                   )
+        years = pd.RangeIndex(matrix.index.min(), matrix.index.max() + 1, name='Rok')
+
+        return matrix.reindex(index=years, columns=columns)
+
+
+    @classmethod
+    def _prepare_store(cls):
+        '''Pripojeni ke sdilenemu ulozisti pripravenych dat (matice casovych rad, dostupnost dat vcetne normalu
+        a index poradi a rekordu)
+        Uloziste vytvori pouze prvni proces pro danou verzi dat, dalsi procesy serveru se pripoji pouze pro cteni
+        bez nacitani .csv a bez vlastni kopie dat v pameti'''
+
+        def build():
+            source_data = cls._load_source_data()
+            series_matrix = cls._compute_series_matrix(source_data)
+            records_index = records.compute_records_index(series_matrix.to_numpy(), series_matrix.index, trends.periods)
+            return series_matrix, cls._compute_data_accessibility(source_data), records_index
+
+        cls.data_version = dataset_version(cls.source_path)
+        cls.series_matrix, cls.data_accessibility, cls.records_index = datastore.load_store(cls.data_version, build)
+
+
+    @classmethod
+    def _prepare_series_cube(cls):
+        '''Matice casovych rad preskladana na krychli roky x stanice x veliciny x filtry (bez kopirovani dat)
+        Blok roky x mesice pro jednu stanici a velicinu je pak jediny rez tohoto pole
+        Stanice a veliciny se na pozice v krychli prekladaji malymi slovniky'''
+
+        columns = cls.series_matrix.columns
+        stations = columns.unique(level='Stanice')
+        quantities = columns.unique(level='Veličina')
+
+        cls.year_pos = {year: i for i, year in enumerate(cls.series_matrix.index)}
+        cls.station_pos = {station: i for i, station in enumerate(stations)}
+        cls.quantity_pos = {quantity: i for i, quantity in enumerate(quantities)}
+        cls.filter_pos = {filter: i for i, filter in enumerate(cls.filters)}
+        cls.series_cube = (cls.series_matrix
+                           .to_numpy()
+                           .reshape(len(cls.series_matrix.index), len(stations), len(quantities), len(cls.filters))
+                           )
+
+
+    @classmethod
+    def month_block(cls, station, quantity, start_yr=None, end_yr=None):
+        '''Vraci dvojici (roky, matice roky x mesice) pro danou stanici a velicinu
+        Matice je pouze pohled do cls.series_cube, nic se nedotazuje ani nekopiruje'''
+
+        years = cls.series_matrix.index
+        first = 0 if start_yr is None else years.searchsorted(start_yr, side='left')
+        last = len(years) if end_yr is None else years.searchsorted(end_yr, side='right')
+
+        # Filtr 'rok' je na prvni pozici, mesice nasleduji v kalendarnim poradi
+        block = cls.series_cube[first:last, cls.station_pos[station], cls.quantity_pos[quantity], 1:]
+
+        return years[first:last], block
+
+
+    @classmethod
+    def _prepare_records_index(cls):
+        '''Index poradi a rekordu pro vsechny casove rady - pocita se jednou pri tvorbe sdileneho uloziste
+        Poradi v celem zaznamu a ve standardnich obdobich, postupne rekordy (maxima / minima) a "nejvyssi od roku"
+        Matice z uloziste se jen bez kopirovani preskladaji do tvaru cls.series_cube,
+        takze se v nich hleda pres stejne slovniky pozic'''
+
+        for key, arr in cls.records_index.items():
+            shape = cls.series_cube.shape if arr.ndim == 2 else cls.series_cube.shape[1:]
+            cls.records_index[key] = arr.reshape(shape)
+
+
+    @classmethod
+    def _series_pos(cls, station, filter, quantity):
+        '''Pozice casove rady v cls.series_cube (bez osy roku)'''
+        return cls.station_pos[station], cls.quantity_pos[quantity], cls.filter_pos[filter]
+
+
+    @classmethod
+    def year_ranks(cls, station, filter, quantity, year):
+        '''Poradi hodnoty daneho roku v celem zaznamu a ve standardnich obdobich (1 = nejvyssi, resp. nejnizsi)
+        Vraci DataFrame s obdobimi v indexu, obdobi, do kterych rok nespada, jsou vynechana'''
+
+        pos = cls._series_pos(station, filter, quantity)
+        row = (cls.year_pos[year],) + pos
+
+        rows = dict()
+        for period in trends.periods.keys():
+            desc = cls.records_index[('rank_desc', period)][row]
+            if not np.isnan(desc):
+                rows[period] = {'Pořadí od nejvyšší': int(desc),
+                                'Pořadí od nejnižší': int(cls.records_index[('rank_asc', period)][row]),
+                                'Počet let': int(cls.records_index[('count', period)][pos])}
+
+        df_out = pd.DataFrame.from_dict(rows, orient='index',
+                                        columns=['Pořadí od nejvyšší', 'Pořadí od nejnižší', 'Počet let'])
+        df_out.index.name = 'Období'
+
+        return df_out
+
+
+    @classmethod
+    def highest_since(cls, station, filter, quantity, year, highest=True):
+        '''Odpoved na "nejvyssi (pri highest=False nejnizsi) hodnota od roku X" pro dany rok
+        Vraci rok X, tj. posledni predchozi rok s alespon stejne vysokou (nizkou) hodnotou
+        None znamena, ze takovy rok neexistuje (hodnota je nejvyssi od zacatku zaznamu) nebo ze data chybi'''
+
+        key = 'since_highest' if highest else 'since_lowest'
+        since = cls.records_index[key][(cls.year_pos[year],) + cls._series_pos(station, filter, quantity)]
+
+        return None if np.isnan(since) else int(since)
+
+
+    @classmethod
+    def records_table(cls, station, filter, quantity):
+        '''Postupne rekordy casove rady - kazde nove maximum a minimum, kdy bylo dosazeno a jaky rekord prekonalo
+        Prvni rok zaznamu (kdy rekord jeste nic neprekonava) se neuvadi'''
+
+        pos = (slice(None),) + cls._series_pos(station, filter, quantity)
+        values = cls.series_cube[pos]
+        years = cls.series_matrix.index
+
+        frames = []
+        for kind, label in (('max', 'maximum'), ('min', 'minimum')):
+            previous = cls.records_index[f'previous_{kind}'][pos]
+            mask = cls.records_index[f'new_{kind}'][pos] & ~np.isnan(previous)
+            frames.append(pd.DataFrame({'Rok': years[mask],
+                                        'Rekord': label,
+                                        'Hodnota': values[mask],
+                                        'Předchozí rekord': previous[mask],
+                                        'Rok předchozího rekordu': cls.records_index[f'previous_{kind}_year'][pos][mask]
+                                        }))
+
+        return (pd.concat(frames)
+                .astype({'Rok předchozího rekordu': int})
+                .sort_values(by=['Rok', 'Rekord'])
+                .set_index('Rok')
+                )
+
+
+    @classmethod
+    def heatmap_req(cls, station, quantity, start_yr=None, end_yr=None, reference=None):
+        '''Teplotni mapa rok x mesic pro danou stanici a velicinu za obdobi start_yr - end_yr
+        reference - None pro zobrazeni namerenych hodnot, nebo nazev normalu (napr. "Normál 1961 - 1990"),
+        pak se zobrazuji odchylky od tohoto normalu pro kazdy mesic
+        Vykresluje se jedinym volanim imshow, vraci graf nebo omluvny string, pokud data nejsou k dispozici'''
+
+        years, block = cls.month_block(station, quantity, start_yr, end_yr)
+
+        if np.isnan(block).all():
+            return 'Data pro zobrazení grafu nejsou k dispozici'
+
+        ylbl = PlotManager.quantities[quantity]['ylabel']
+
+        if reference is None:
+            values = block
+            cmap, vmin, vmax = 'viridis', np.nanmin(block), np.nanmax(block)
+            cbar_lbl = ylbl
+            chart_ttl = f'Stanice: {station}, měsíční data'
+        else:
+            # Normaly pro jednotlive mesice (chybejici normal -> NaN, mesic zustane prazdny)
+            keys = [(station, month, quantity) for month in cls.filters[1:]]
+            normals = cls.data_accessibility[reference].reindex(keys).to_numpy(dtype=float)
+            values = block - normals
+            limit = np.nanmax(np.abs(values)) if not np.isnan(values).all() else 1.0
+            cmap, vmin, vmax = 'coolwarm', -limit, limit
+            cbar_lbl = f'Odchylka od normálu - {ylbl}'
+            chart_ttl = f'Stanice: {station}, odchylky od normálu ({reference.partition(" ")[2]})'
+
+        # Vyska grafu roste s poctem let, aby radky zustaly citelne i pro dlouhe rady
+        fig, ax = plt.subplots(figsize=(12, max(6, len(years) * 0.12)))
+        image = ax.imshow(values,
+                          aspect='auto',
+                          interpolation='nearest',
+                          cmap=cmap,
+                          vmin=vmin,
+                          vmax=vmax,
+                          extent=(-0.5, values.shape[1] - 0.5, years[-1] + 0.5, years[0] - 0.5))
+
+        # Popisky osy y - kazdy rok jen u kratkych obdobi, jinak po 5 nebo 10 letech
+        step = 1 if len(years) <= 30 else 5 if len(years) <= 80 else 10
+        yticks = [year for year in years if year % step == 0]
+
+        ax.set_xticks(range(values.shape[1]))
+        ax.set_xticklabels(cls.filters[1:], rotation=45)
+        ax.set_yticks(yticks)
+        ax.set_ylabel('Rok')
+        ax.set_title(chart_ttl)
+        fig.colorbar(image, ax=ax, label=cbar_lbl)
+
+        return fig
+
+
+    @classmethod
+    def _prepare_trend_table(cls):
+        '''Trendy (Senuv sklon, Mann-Kendall, OLS) pro vsechny casove rady a standardni obdobi
+        Vypocet je narocny, proto se vysledek uklada na disk a pri stejne verzi dat se jen nacte'''
+
+        cls.trend_table = cached_frame('trends', cls.data_version,
+                                       lambda: trends.compute_trend_table(cls.series_matrix))
+
+
+    @classmethod
+    def _prepare_extremes_table(cls):
+        '''Navrhove hodnoty denniho uhrnu srazek (doby opakovani) pro vsechny stanice
+        Fit Gumbelova a GEV rozdeleni na rocni maxima vcetne bootstrapovych intervalu, ulozeno na disk podle verze dat'''
+
+        annual_maxima = cls.series_matrix.xs(('rok', 'Srážky - denní maximum'), level=['Měsíc', 'Veličina'], axis=1)
+        cls.extremes_table = cached_frame('extremes', cls.data_version,
+                                          lambda: extremes.compute_extremes_table(annual_maxima))
+
+
+    @classmethod
+    def return_levels(cls, station):
+        '''Navrhove hodnoty denniho uhrnu srazek pro danou stanici
+        Vraci prazdnou DataFrame, pokud pro stanici neni dostatek rocnich maxim'''
+
+        if station not in cls.extremes_table.index.get_level_values('Stanice'):
+            return pd.DataFrame(columns=extremes.columns)
+
+        return cls.extremes_table.loc[station]
+
+
+    @classmethod
+    def _remove_stale_cache(cls):
+        '''Uklid cache - po nacteni aktualni verze dat se smazou uloziste a tabulky vsech ostatnich verzi,
+        aby cache pri pravidelne aktualizaci dat nerostla bez omezeni'''
+
+        remove_stale([datastore.store_path(cls.data_version),
+                      frame_path('trends', cls.data_version),
+                      frame_path('extremes', cls.data_version)])
+
+
+    @classmethod
+    def trend_ranking(cls, filter, quantity, period):
+        '''Poradi stanic podle Senova sklonu trendu pro dany filtr, velicinu a standardni obdobi
+        Stanice bez dostatku dat pro vypocet trendu jsou vynechany'''
+
+        return (cls.trend_table
+                .xs((filter, quantity, period), level=['Měsíc', 'Veličina', 'Období'])
+                .dropna(subset=['Senův sklon'])
+                .sort_values(by='Senův sklon', ascending=False)
+                )
 
 
     def __init__(self, selection):
@@ -112,12 +385,16 @@ class PlotManager:
         # Selekce v samostatne promenne pro snazsi referencovani
         slc = self.selection
 
-        # Vyberu data pro danou stanici a velicinu, rok jako index
-        return (PlotManager.source_data
-                        .query("Stanice == @slc['location'] & Měsíc == @slc['filter']")
-                        .set_index('Rok')
-                        .loc[slc['start_yr']:slc['end_yr'],[slc['quantity']]]
+        # Vyberu casovou radu pro danou stanici, filtr a velicinu ze sdilene matice, rok jako index
+        # Pokud rada v matici neni (zadna data), vracim prazdnou DataFrame se stejnou strukturou
+        key = (slc['location'], slc['filter'], slc['quantity'])
+        if key not in PlotManager.series_matrix.columns:
+            return pd.DataFrame(columns=[slc['quantity']], index=pd.Index([], name='Rok'), dtype=float)
+
+        return (PlotManager.series_matrix[key]
+                        .loc[slc['start_yr']:slc['end_yr']]
                         .dropna()
+                        .to_frame(slc['quantity'])
                 )
 
 
@@ -178,6 +455,11 @@ class PlotManager:
             stats['b'] = float(b)
             stats['R2'] = float(r2)
 
+            # Robustni odhad trendu a jeho vyznamnost
+            robust = trends.trend_params(x, y.to_numpy(), min_count=3)
+            stats['Senův sklon'] = float(robust['Senův sklon'][0])
+            stats['p-hodnota (Mann-Kendall)'] = float(robust['p-hodnota (Mann-Kendall)'][0])
+
         return stats
 
 
@@ -333,6 +615,8 @@ class PlotManager:
             keys = ['a', 'b']
             dict_ = {k:f'{v:.3f}' for k, v in self.slc_period_stats.items() if k in keys}
             dict_['R2'] = f"{self.slc_period_stats['R2']:.2f}"
+            dict_['Senův sklon'] = f"{self.slc_period_stats['Senův sklon']:.3f}"
+            dict_['p-hodnota (Mann-Kendall)'] = f"{self.slc_period_stats['p-hodnota (Mann-Kendall)']:.3f}"
 
         df_out = pd.DataFrame.from_dict(dict_, orient='index', columns=['Hodnota'])
         df_out.index.name = 'Parametr'
@@ -341,7 +625,12 @@ class PlotManager:
 
 
 # Az tady musim incializovat class variable data_accessibility, protoze uvnitr class nelze volat class methods
-PlotManager._prepare_data_accessibility_tbl()
+PlotManager._prepare_store()
+PlotManager._prepare_series_cube()
+PlotManager._prepare_records_index()
+PlotManager._prepare_trend_table()
+PlotManager._prepare_extremes_table()
+PlotManager._remove_stale_cache()
 
 if __name__ == '__main__':
     selection = \
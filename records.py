@@ -0,0 +1,103 @@
+import numpy as np
+import pandas as pd
+
+
+def rank_matrix(values, ascending=False):
+    '''Poradi hodnot v kazdem sloupci matice values (roky x rady), 1 = nejvyssi (pri ascending=False)
+    Shodne hodnoty maji stejne (nejlepsi) poradi, chybejici hodnoty zustavaji NaN'''
+    return pd.DataFrame(values).rank(axis=0, method='min', ascending=ascending).to_numpy()
+
+
+def running_records(values, years):
+    '''Postupne rekordy pro kazdy sloupec matice values (roky x rady)
+    Vraci slovnik matic stejneho tvaru: zda byl v danem roce prekonan maximalni / minimalni rekord
+    a hodnotu a rok rekordu, ktery do te doby platil (NaN pro prvni rok s daty)'''
+
+    years = np.asarray(years, dtype=float)
+    rows = np.arange(values.shape[0])[:, np.newaxis]
+    out = dict()
+
+    for kind, accumulate, better in (('max', np.fmax.accumulate, np.greater), ('min', np.fmin.accumulate, np.less)):
+        # Dosavadni rekord pred danym rokem (posunuto o jeden radek)
+        running = accumulate(values, axis=0)
+        previous = np.vstack([np.full((1, values.shape[1]), np.nan), running[:-1]])
+
+        # Novy rekord: hodnota lepsi nez dosavadni rekord, nebo prvni rok s daty
+        with np.errstate(invalid='ignore'):
+            new = better(values, previous) | (np.isnan(previous) & ~np.isnan(values))
+
+        # Radek posledniho rekordu az do daneho roku, posunuto o jeden radek -> rok dosavadniho rekordu
+        last_row = np.maximum.accumulate(np.where(new, rows, -1), axis=0)
+        previous_row = np.vstack([np.full((1, values.shape[1]), -1), last_row[:-1]])
+
+        out[f'new_{kind}'] = new
+        out[f'previous_{kind}'] = previous
+        out[f'previous_{kind}_year'] = np.where(previous_row >= 0, years[previous_row], np.nan)
+
+    return out
+
+
+def since_years(values, years, highest=True):
+    '''Pro kazdy rok a radu vraci posledni predchozi rok s hodnotou alespon stejne vysokou (highest=True),
+    resp. alespon stejne nizkou (highest=False) - tj. odpoved na "nejvyssi hodnota od roku X"
+    NaN znamena, ze hodnota je nejvyssi (nejnizsi) od zacatku zaznamu, nebo ze v danem roce data chybi
+    Monotonni zasobnik ve forme odkazu: prev[j] je radek posledniho predchoziho roku s hodnotou >= hodnote v roce j.
+    Pokud je hodnota v roce j mensi nez hledana, vsechny roky mezi prev[j] a j jsou mensi take a lze je preskocit.
+    Roky bez dat se preskakuji celou mezerou najednou (odkaz na posledni rok s daty) a samy se nehledaji.
+    Roky se prochazeji postupne, vsechny rady najednou - pamet O(roky x rady), kazda rada v souctu O(roky) skoku'''
+
+    years = np.asarray(years, dtype=float)
+    values = values if highest else -values
+    n, m = values.shape
+    cols = np.arange(m)
+
+    # Posledni rok s daty az do daneho roku vcetne (-1 = zadny)
+    valid = ~np.isnan(values)
+    last_valid = np.maximum.accumulate(np.where(valid, np.arange(n)[:, np.newaxis], -1), axis=0)
+
+    # Odkazy na predchozi rok s alespon stejnou hodnotou (-1 = zadny), vzdy na rok s daty
+    prev = np.full((n, m), -1)
+
+    for i in range(1, n):
+        current = values[i]
+        j = last_valid[i - 1].copy()
+
+        while True:
+            # Kandidat j je vzdy rok s daty, hleda se pouze pro roky s daty
+            candidate = values[np.maximum(j, 0), cols]
+            unresolved = valid[i] & (j >= 0) & ~(candidate >= current)
+            if not unresolved.any():
+                break
+            j = np.where(unresolved, prev[np.maximum(j, 0), cols], j)
+
+        prev[i] = np.where(valid[i], j, -1)
+
+    return np.where(prev >= 0, years[np.maximum(prev, 0)], np.nan)
+
+
+def compute_records_index(values, years, periods):
+    '''Kompletni index poradi a rekordu pro matici values (roky x rady)
+    periods - slovnik {nazev: (prvni rok, posledni rok)}, (None, None) pro cely zaznam
+    Poradi v obdobi se pocita jen z let obdobi, mimo obdobi je NaN
+    Vraci slovnik matic stejneho tvaru jako values, pouze pocty let s daty ('count', obdobi) maji tvar values.shape[1:]'''
+
+    years = np.asarray(years)
+    index = running_records(values, years)
+    index['since_highest'] = since_years(values, years, highest=True)
+    index['since_lowest'] = since_years(values, years, highest=False)
+
+    for period, (start_year, end_year) in periods.items():
+        in_period = np.ones(len(years), dtype=bool)
+        if start_year is not None:
+            in_period &= years >= start_year
+        if end_year is not None:
+            in_period &= years <= end_year
+
+        for ascending in (False, True):
+            ranks = np.full(values.shape, np.nan)
+            ranks[in_period] = rank_matrix(values[in_period], ascending)
+            index[('rank_asc' if ascending else 'rank_desc', period)] = ranks
+
+        index[('count', period)] = (~np.isnan(values[in_period])).sum(axis=0)
+
+    return index
@@ -0,0 +1,99 @@
+import math
+import warnings
+import numpy as np
+import pandas as pd
+
+
+# Standardni obdobi, pro ktera se trendy predpocitavaji, (None, None) znamena cele dostupne obdobi
+periods = \
+    {'Celé období': (None, None),
+     'Normál 1961 - 1990': (1961, 1990),
+     'Normál 1981 - 2010': (1981, 2010),
+     'Normál 1991 - 2020': (1991, 2020)}
+
+# Minimalni pocet let s daty, aby mel odhad trendu smysl
+min_years = 10
+
+# Pocet casovych rad zpracovanych najednou - pamet trend_params roste s (pocet let)^2 x pocet rad,
+# po blocich je tak omezena nezavisle na poctu stanic
+chunk_size = 256
+
+columns = ['Senův sklon', 'p-hodnota (Mann-Kendall)', 'OLS sklon', 'Počet let']
+
+
+def trend_params(years, values, min_count=min_years):
+    '''Vektorovy vypocet trendu pro vice casovych rad najednou
+    years - pole roku (delka n), values - matice n x m (kazdy sloupec jedna casova rada, chybejici data NaN)
+    Vraci slovnik poli delky m: Senuv sklon, p-hodnotu Mann-Kendallova testu, sklon OLS a pocet let s daty
+    Rady s mene nez min_count roky maji misto vysledku NaN'''
+
+    x = np.asarray(years, dtype=float)
+    y = np.asarray(values, dtype=float)
+    if y.ndim == 1:
+        y = y[:, np.newaxis]
+
+    valid = ~np.isnan(y)
+    n = valid.sum(axis=0)
+
+    with np.errstate(invalid='ignore', divide='ignore'), warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+
+        # OLS - sklon z centrovanych hodnot, pocitano pouze pres roky s daty
+        xv = np.where(valid, x[:, np.newaxis], 0.0)
+        yv = np.where(valid, y, 0.0)
+        x_mean = xv.sum(axis=0) / n
+        y_mean = yv.sum(axis=0) / n
+        dx = np.where(valid, x[:, np.newaxis] - x_mean, 0.0)
+        ols = (dx * (yv - y_mean)).sum(axis=0) / (dx ** 2).sum(axis=0)
+
+        # Vsechny dvojice roku i < j najednou - rozdily hodnot maji tvar (pocet dvojic, m)
+        # Dvojice, ve kterych chybi jedna z hodnot, maji rozdil NaN a nan-funkce je ignoruji
+        i, j = np.triu_indices(len(x), k=1)
+        diffs = y[j] - y[i]
+        sen = np.nanmedian(diffs / (x[j] - x[i])[:, np.newaxis], axis=0)
+
+        # Mann-Kendall: statistika S a jeji rozptyl s korekci na shodne hodnoty
+        # Pro kazdou hodnotu t = pocet shodnych hodnot v rade (vcetne sebe sama)
+        # Skupina t shodnych hodnot prispiva t(t - 1)(2t + 5), tj. kazdy jeji prvek (t - 1)(2t + 5)
+        s = np.nansum(np.sign(diffs), axis=0)
+        ties = (diffs == 0).astype(float)
+        t = np.ones_like(y)
+        np.add.at(t, i, ties)
+        np.add.at(t, j, ties)
+        tie_term = np.where(valid, (t - 1) * (2 * t + 5), 0.0).sum(axis=0)
+        var_s = (n * (n - 1) * (2 * n + 5) - tie_term) / 18
+
+        # Normalni aproximace s korekci na spojitost, oboustranny test
+        z = np.where(var_s > 0, (s - np.sign(s)) / np.sqrt(var_s), 0.0)
+        p = np.vectorize(math.erfc, otypes=[float])(np.abs(z) / math.sqrt(2))
+
+    # Kratke rady nemaji vypovidajici hodnotu
+    short = n < max(min_count, 2)
+    for arr in (sen, p, ols):
+        arr[short] = np.nan
+
+    return {'Senův sklon': sen,
+            'p-hodnota (Mann-Kendall)': p,
+            'OLS sklon': ols,
+            'Počet let': n}
+
+
+def compute_trend_table(series_matrix):
+    '''Vypocet trendu pro vsechny casove rady a standardni obdobi
+    series_matrix - DataFrame s roky v indexu a sloupci (Stanice, Měsíc, Veličina)
+    Vraci DataFrame s indexem (Stanice, Měsíc, Veličina, Období) a sloupci podle promenne columns
+    Rady se zpracovavaji po blocich o chunk_size sloupcich'''
+
+    frames = []
+
+    for period, (start_year, end_year) in periods.items():
+        sub = series_matrix.loc[start_year:end_year]
+        values = sub.to_numpy()
+
+        for start in range(0, values.shape[1], chunk_size):
+            res = pd.DataFrame(trend_params(sub.index, values[:, start:start + chunk_size]),
+                               index=series_matrix.columns[start:start + chunk_size])
+            res['Období'] = period
+            frames.append(res.set_index('Období', append=True))
+
+    return pd.concat(frames)[columns].sort_index()